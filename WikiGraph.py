@@ -1,132 +1,308 @@
+import os
 import struct
+import sys
 import mmap
-import varint  # for variable integer encoding
-import zlib
-import json
+import varint  # for the edge count prefix
+import zstandard as zstd
+import orjson
+import numpy as np
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+from itertools import chain
 from line_profiler import profile
 
-class BiDict:
-    def __init__(self):
-        self.forward = {}
-        self.backward = {}
-
-    def __setitem__(self, key, value):
-        self.forward[key] = value
-        self.backward[value] = key
-
-    def __getitem__(self, key):
-        try:
-            return self.forward[key]
-        except KeyError:
-            return self.backward[key]
-
-    def get(self, key, default=None):
-        try:
-            return self[key]
-        except KeyError:
-            return default
-
-    def __contains__(self, key):
-        return key in self.forward or key in self.backward
-
-    def __len__(self):
-        return len(self.forward)
-
-    def __str__(self):
-        return str(self.forward)
-    def items(self):
-        """Return forward dictionary items"""
-        return self.forward.items()
+def encode_edge_lists(degrees, targets):
+    """Encode consecutive edge lists at once, each sorted and delta + Stream VByte encoded
+
+    degrees holds each list's (non-zero) length and targets all their edges back to back.
+    Every list becomes its varint edge count, all 2-bit length codes of its deltas, then
+    their 1-4 significant little-endian bytes. Returns the encoded lists concatenated and
+    the offset of each one, plus the end.
+    """
+    degrees = np.asarray(degrees, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    num_lists = len(degrees)
+    if num_lists == 0:
+        return b'', np.zeros(1, dtype=np.int64)
+    list_starts = np.cumsum(degrees) - degrees
+    owner = np.repeat(np.arange(num_lists), degrees)
+    rank = np.arange(len(targets)) - list_starts[owner]  # position within its own list
+
+    # Sort every list, then delta-encode against the previous edge, restarting per list
+    edges = targets[np.lexsort((targets, owner))]
+    deltas = np.empty_like(edges)
+    deltas[1:] = edges[1:] - edges[:-1]
+    deltas[list_starts] = edges[list_starts]
+    if deltas.max() > 0xffffffff:
+        raise ValueError("Stream VByte values must fit in 32 bits")
+    value_lengths = 1 + (deltas > 0xff) + (deltas > 0xffff) + (deltas > 0xffffff)
+
+    # Each list is its varint edge count, one control byte per four edges, then the data bytes
+    count_lengths = 1 + sum((degrees >> (7 * k) > 0).astype(np.int64) for k in range(1, 5))
+    control_lengths = (degrees + 3) // 4
+    value_starts = np.cumsum(value_lengths) - value_lengths
+    sizes = count_lengths + control_lengths + np.add.reduceat(value_lengths, list_starts)
+    offsets = np.zeros(num_lists + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    out = np.zeros(offsets[-1], dtype=np.uint8)
+
+    for k in range(int(count_lengths.max())):
+        has_byte = count_lengths > k
+        out[offsets[:-1][has_byte] + k] = ((degrees[has_byte] >> (7 * k)) & 0x7f) | \
+            np.where(count_lengths[has_byte] > k + 1, 0x80, 0)
+
+    # Four consecutive edges share a control byte, so sum their shifted length codes
+    control_starts = offsets[:-1] + count_lengths
+    group_first = rank % 4 == 0
+    codes = (value_lengths - 1) << (2 * (rank % 4))
+    out[control_starts[owner[group_first]] + rank[group_first] // 4] = \
+        np.add.reduceat(codes, np.flatnonzero(group_first))
+
+    data_pos = (control_starts + control_lengths - value_starts[list_starts])[owner] + value_starts
+    for k in range(4):
+        has_byte = value_lengths > k
+        out[data_pos[has_byte] + k] = (deltas[has_byte] >> (8 * k)) & 0xff
+    return out.tobytes(), offsets
+
+def read_varint(data, pos=0):
+    """Decode a single varint at data[pos:], returning (value, next_pos)"""
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+def decode_streamvbyte(data, count, offset=0):
+    """Decode `count` Stream VByte integers starting at data[offset:]"""
+    if count == 0:
+        return np.empty(0, dtype=np.uint32)
+    buf = np.frombuffer(data, dtype=np.uint8, offset=offset)
+
+    # Unpack the four 2-bit length codes of every control byte
+    num_control = (count + 3) // 4
+    lengths = ((buf[:num_control, None] >> np.arange(0, 8, 2, dtype=np.uint8)) & 3).ravel()[:count] + 1
+    data = buf[num_control:]
+    total = int(lengths.sum())
+    if len(lengths) < count or len(data) < total:
+        raise ValueError("Truncated Stream VByte data")
+    if total == count:
+        return data[:count].astype(np.uint32)  # Every value is a single byte
+
+    # Scatter the data bytes into zero-padded 4-byte little-endian slots
+    slots = np.zeros((count, 4), dtype=np.uint8)
+    slots[np.arange(4) < lengths[:, None]] = data[:total]
+    return slots.view('<u4').ravel()
+
+def parse_batch(lines):
+    """Parse a batch of JSONL lines against a batch-local title table
+
+    Returns the titles in first-seen order (their local IDs are their positions), and per
+    node its local ID, its edge count and all edges flattened into one array.
+    """
+    # setdefault hands a new title the next local ID in a single dict call
+    local_ids = {}
+    local_id = local_ids.setdefault
+    sources, degrees, targets = [], [], []
+    for line in lines:
+        for node_title, linked_titles in orjson.loads(line).items():
+            sources.append(local_id(node_title, len(local_ids)))
+            degrees.append(len(linked_titles))
+            targets.extend([local_id(title, len(local_ids)) for title in linked_titles])
+    return (list(local_ids), np.array(sources, dtype=np.int64), np.array(degrees, dtype=np.int64),
+            np.array(targets, dtype=np.int64))
+
+def encode_batch(node_ids, degrees, targets, dict_data, compress, compression_level,
+                 tiny_degree, superblock_nodes, superblock_size, block_align):
+    """Encode a batch of edge lists into one contiguous run of blocks
+
+    Nodes with at most tiny_degree edges, and every node when not compressing, get raw
+    blocks aligned to block_align; the rest are zstd compressed in super-blocks, which
+    never span batches. Returns the run and its index records, with positions relative to
+    the start of the run, which must itself be written block_align aligned.
+    """
+    encoded, offsets = encode_edge_lists(degrees, targets)
+    cctx = zstd.ZstdCompressor(level=compression_level,
+                               dict_data=zstd.ZstdCompressionDict(dict_data) if dict_data else None)
+    index = np.zeros(len(degrees), dtype=WikiLinkWriter.INDEX_DTYPE)
+    index['id'] = node_ids
+    index['degree'] = np.minimum(degrees, WikiLinkWriter.MAX_INDEX_DEGREE)
+
+    run = bytearray()
+    members, member_offsets, payload = [], [0], bytearray()
+    for row, (degree, start, end) in enumerate(zip(degrees.tolist(), offsets.tolist(), offsets[1:].tolist())):
+        if not compress or degree <= tiny_degree:
+            # Raw blocks are read in place from the mmap, so keep the larger ones aligned
+            if degree > tiny_degree:
+                run += bytes(-len(run) % block_align)
+            index['pos'][row] = len(run)
+            run += struct.pack('<I', end - start)
+            run += encoded[start:end]
+            continue
+
+        # Batch nodes into super-blocks so each frame amortizes the zstd overhead
+        index['slot'][row] = len(members)
+        members.append(row)
+        payload += encoded[start:end]
+        member_offsets.append(len(payload))
+        if len(members) == superblock_nodes or len(payload) >= superblock_size:
+            index['pos'][members] = len(run)
+            run += compress_superblock(cctx, member_offsets, payload)
+            members, member_offsets, payload = [], [0], bytearray()
+    if members:
+        index['pos'][members] = len(run)
+        run += compress_superblock(cctx, member_offsets, payload)
+    return bytes(run), index
+
+def compress_superblock(cctx, offsets, payload):
+    """Compress a group of encoded blocks as one frame, prefixed by their offsets in it"""
+    compressed = cctx.compress(payload)
+    return struct.pack(f'<IH{len(offsets)}I', len(compressed), len(offsets) - 1, *offsets) + compressed
 
 class WikiLinkWriter:
     MAGIC = b"WLINKNET"
-    VERSION = 1
+    VERSION = 7
     BLOCK_SIZE = 16384
     LIMIT = None
-
-    def __init__(self, output_path, map_path):
+    COMPRESSION_LEVEL = 3
+    DICT_SIZE = 64 * 1024  # bytes of trained zstd dictionary
+    DICT_SAMPLES = 1000  # encoded blocks sampled for dictionary training
+    BATCH_BYTES = 16 * 1024 * 1024  # JSONL bytes handed to a parser worker at a time
+    SUPERBLOCK_NODES = 128  # nodes compressed together in one super-block
+    SUPERBLOCK_SIZE = 64 * 1024  # flush a super-block early once its payload reaches this
+    INDEX_DTYPE = np.dtype([('id', '<u4'), ('pos', '<u8'), ('slot', '<u2'), ('degree', '<u2')])  # index record layout
+    MAX_INDEX_DEGREE = 0xffff  # larger degrees are clamped in the index
+    TINY_DEGREE = 4  # nodes with at most this many edges (one control byte) are always stored raw
+    COMPRESSION_FLAG = 1  # header flag: edge blocks are zstd compressed
+    BLOCK_ALIGN = 64  # alignment of uncompressed blocks
+
+    def __init__(self, output_path, map_path, compress=True, workers=1):
+        self.compress = compress
+        self.workers = workers or os.cpu_count() or 1
         self.outfile = open(output_path, 'wb')
         self.mapfile = open(map_path, 'w', encoding='utf-8')
         self.node_map = {}  # title -> node_id
         self.current_node_id = 0
-        self.index = []
 
     def write_header(self):
         # Placeholder for header, will be updated later
         self.outfile.write(self.MAGIC)
-        self.outfile.write(struct.pack('<II', self.VERSION, 0))  # Node count will be updated later
+        flags = self.COMPRESSION_FLAG if self.compress else 0
+        self.outfile.write(struct.pack('<III', self.VERSION, 0, flags))  # Node count will be updated later
 
     def process_jsonl_dump(self, jsonl_file):
         """Process Wikipedia JSONL file"""
         self.write_header()
-        current_pos = self.outfile.tell()
-
-        # First pass: collect all node IDs and their edges
-        nodes_with_edges = {}  # node_id -> edge_list
-        for i, line in enumerate(jsonl_file):
-            # if i >= 1000:
-            #     break
-            data = json.loads(line)
-            for node_title, linked_titles in data.items():
-                if node_title not in self.node_map:
-                    self.node_map[node_title] = self.current_node_id
-                    self.mapfile.write(f"{self.current_node_id}\t{node_title}\n")
-                    self.current_node_id += 1
-                
-                node_id = self.node_map[node_title]
-                edge_ids = []
-                for title in linked_titles:
-                    if title not in self.node_map:
-                        self.node_map[title] = self.current_node_id
-                        self.mapfile.write(f"{self.current_node_id}\t{title}\n")
-                        self.current_node_id += 1
-                    edge_ids.append(self.node_map[title])
-                
-                if edge_ids:  # Only store nodes that actually have edges
-                    nodes_with_edges[node_id] = edge_ids
-
-        # Write only nodes that have edges
-        for node_id, edge_ids in nodes_with_edges.items():
-            # print(f"Writing edges for node {node_id}: {edge_ids}")
-            encoded_edges = self.encode_edges(edge_ids)
-            compressed = zlib.compress(encoded_edges)
-            self.outfile.write(struct.pack('<I', len(compressed)))
-            self.outfile.write(compressed)
-            self.index.append((node_id, current_pos))
-            current_pos = self.outfile.tell()
-
-        # Write index
-        index_pos = current_pos
-        # print(f"Writing index at position: {index_pos}")
-        for node_id, pos in sorted(self.index):
-            # print(f"Writing index entry: node_id={node_id}, pos={pos}")
-            self.outfile.write(struct.pack('<QQ', node_id, pos))
+        with ProcessPoolExecutor(self.workers) if self.workers > 1 else nullcontext() as executor:
+            batches = self.parse_jsonl(jsonl_file, executor)
+            first = next(batches, None)
+
+            # Train the shared dictionary on the first batch's blocks, store it after the header
+            dict_data = self.train_dictionary(*first[1:]) if self.compress and first else b''
+            self.outfile.write(struct.pack('<I', len(dict_data)))
+            self.outfile.write(dict_data)
+
+            # Encoding and compression run per batch, in the workers when there are any; each
+            # run of blocks comes back with index records relative to its own start
+            encode = partial(encode_batch, dict_data=dict_data, compress=self.compress,
+                             compression_level=self.COMPRESSION_LEVEL, tiny_degree=self.TINY_DEGREE,
+                             superblock_nodes=self.SUPERBLOCK_NODES, superblock_size=self.SUPERBLOCK_SIZE,
+                             block_align=self.BLOCK_ALIGN)
+            index_parts = []
+            for run, index in self.map_ordered(executor, encode, chain([first] if first else [], batches)):
+                self.outfile.write(bytes(-self.outfile.tell() % self.BLOCK_ALIGN))
+                index['pos'] += self.outfile.tell()
+                self.outfile.write(run)
+                index_parts.append(index)
+
+        # Write index, sorted by node id, in a single write; a node listed again
+        # replaces its earlier block, so keep each id's last record
+        index_pos = self.outfile.tell()
+        index = np.concatenate(index_parts) if index_parts else np.empty(0, dtype=self.INDEX_DTYPE)
+        _, last = np.unique(index['id'][::-1], return_index=True)
+        index[len(index) - 1 - last].tofile(self.outfile)
 
         # Write index position at end of file
         self.outfile.write(struct.pack('<Q', index_pos))
-        # print(f"Wrote index position {index_pos} at file end")
 
         # Update node count in header
-        self.outfile.seek(8)
+        self.outfile.seek(12)
         self.outfile.write(struct.pack('<I', self.current_node_id))
-        # print(f"Updated header with node count: {self.current_node_id}")
+
+    def parse_jsonl(self, jsonl_file, executor=None):
+        """Assign node IDs while reading the dump, yielding (node_ids, degrees, targets) per batch
+
+        Only nodes that actually have edges are yielded; targets holds their edges back to back.
+        """
+        get_node_id = self.get_node_id
+        batches = ((batch,) for batch in self.read_batches(jsonl_file))
+        for titles, sources, degrees, targets in self.map_ordered(executor, parse_batch, batches):
+            # Batches come back in file order, so mapping each batch's titles in
+            # first-seen order hands out the same IDs as a single serial pass
+            lookup = np.fromiter(map(get_node_id, titles), dtype=np.int64, count=len(titles))
+            has_edges = degrees > 0
+            yield lookup[sources[has_edges]], degrees[has_edges], lookup[targets]
+
+    def map_ordered(self, executor, fn, calls):
+        """Apply fn to each argument tuple, across worker processes if given an executor, yielding results in order"""
+        if executor is None:
+            for args in calls:
+                yield fn(*args)
+            return
+
+        # One call per worker plus the one being consumed keeps at most
+        # (workers + 1) batches of each stage in flight
+        in_flight = deque()
+        for args in calls:
+            in_flight.append(executor.submit(fn, *args))
+            if len(in_flight) > self.workers:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+    def read_batches(self, jsonl_file):
+        """Group the dump's lines into batches of roughly BATCH_BYTES"""
+        batch, size = [], 0
+        for line in jsonl_file:
+            batch.append(line)
+            size += len(line)
+            if size >= self.BATCH_BYTES:
+                yield batch
+                batch, size = [], 0
+        if batch:
+            yield batch
+
+    def get_node_id(self, title):
+        """Return the node ID for a title, assigning the next one on first sight"""
+        title = sys.intern(title)
+        node_id = self.node_map.get(title)
+        if node_id is None:
+            node_id = self.node_map[title] = self.current_node_id
+            self.mapfile.write(f"{node_id}\t{title}\n")
+            self.current_node_id += 1
+        return node_id
+
+    def train_dictionary(self, degrees, targets):
+        """Train a zstd dictionary on a batch's first compressed blocks, empty if there is too little data"""
+        sampled = np.zeros(len(degrees), dtype=bool)
+        sampled[np.flatnonzero(degrees > self.TINY_DEGREE)[:self.DICT_SAMPLES]] = True
+        encoded, offsets = encode_edge_lists(degrees[sampled], targets[np.repeat(sampled, degrees)])
+        offsets = offsets.tolist()
+        try:
+            return zstd.train_dictionary(self.DICT_SIZE, [encoded[start:end] for start, end in zip(offsets, offsets[1:])]).as_bytes()
+        except zstd.ZstdError:
+            return b''
 
     def encode_edges(self, edges):
-        """Encode edge list with delta + varint compression"""
-        encoded = bytearray()
-        
-        # Write number of edges
-        encoded.extend(varint.encode(len(edges)))
-        
-        # Sort and encode deltas
-        sorted_edges = sorted(edges)
-        prev = 0
-        for edge in sorted_edges:
-            delta = edge - prev
-            encoded.extend(varint.encode(delta))
-            prev = edge
-            
-        return bytes(encoded)
+        """Encode edge list with delta + Stream VByte compression"""
+        if len(edges) == 0:
+            return varint.encode(0)
+        encoded, _ = encode_edge_lists([len(edges)], edges)
+        return encoded
 
 
     def close(self):
@@ -136,31 +312,18 @@ class WikiLinkWriter:
     # Add this verification method to the writer
     def verify_encoding(self, original_edges, encoded_data):
         """Verify that edges can be correctly decoded"""
-        pos = 0
-        decoded_edges = []
-        
-        # Read number of edges
-        num_edges = varint.decode_bytes(encoded_data[pos:])
-        pos += len(varint.encode(num_edges))
-        
-        # Decode edges
-        prev = 0
-        for _ in range(num_edges):
-            delta = varint.decode_bytes(encoded_data[pos:])
-            pos += len(varint.encode(delta))
-            prev += delta
-            decoded_edges.append(prev)
-        
-        # Compare original and decoded edges
-        original_sorted = sorted(original_edges)
-        if original_sorted != decoded_edges:
-            # print("Encoding verification failed!")
-            # print(f"Original (sorted): {original_sorted}")
-            # print(f"Decoded: {decoded_edges}")
-            return False
-        return True
+        # Decode with the same vectorized path the reader uses, then compare with the sorted original
+        try:
+            num_edges, pos = read_varint(encoded_data)
+            decoded_edges = decode_streamvbyte(encoded_data, num_edges, pos).cumsum(dtype=np.uint32)
+            return np.array_equal(np.sort(np.asarray(original_edges, dtype=np.uint32)), decoded_edges)
+        except (IndexError, ValueError, OverflowError):
+            return False  # Truncated block, or ids that cannot be stored as uint32
 
 class WikiLinkReader:
+    CACHE_BYTES = 64 * 1024 * 1024  # decompressed super-block bytes kept in memory
+    SEARCH_WINDOW = 64  # index entries searched either side of an interpolated guess
+
     def __init__(self, filename, map_path):
         self.file = open(filename, 'rb')
         self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
@@ -169,126 +332,256 @@ class WikiLinkReader:
         if self.mmap[:8] != WikiLinkWriter.MAGIC:
             raise ValueError("Invalid file format")
 
-        # Read header
-        self.version, self.node_count = struct.unpack('<II', self.mmap[8:16])
+        # Read header; older layouts differ past the version field, so check it first
+        self.version = struct.unpack('<I', self.mmap[8:12])[0]
+        if self.version != WikiLinkWriter.VERSION:
+            raise ValueError(f"Unsupported file version {self.version}, expected {WikiLinkWriter.VERSION}")
+        self.node_count, self.flags = struct.unpack('<II', self.mmap[12:20])
+        self.compressed = bool(self.flags & WikiLinkWriter.COMPRESSION_FLAG)
+
+        # Read compression dictionary stored after the header
+        dict_size = struct.unpack('<I', self.mmap[20:24])[0]
+        dict_data = zstd.ZstdCompressionDict(self.mmap[24:24+dict_size]) if dict_size else None
+        self.dctx = zstd.ZstdDecompressor(dict_data=dict_data)
+        self._superblocks = OrderedDict()  # block position -> (payload, offsets), least recently used first
+        self._superblock_bytes = 0
 
         # Read index position
         self.mmap.seek(-8, 2)
         self.index_pos = struct.unpack('<Q', self.mmap.read(8))[0]
 
+        # Edge blocks are hit at random, so skip readahead there; every lookup
+        # searches the index, so fault that in up front
+        if hasattr(mmap, 'MADV_RANDOM'):
+            index_start = self.index_pos - self.index_pos % mmap.PAGESIZE
+            self.mmap.madvise(mmap.MADV_RANDOM, 0, index_start)
+            self.mmap.madvise(mmap.MADV_WILLNEED, index_start)
+
         # Load index
         self.load_index()
 
         # Load title map
-        self.title_map = self.load_title_map(map_path)
+        self.load_title_map(map_path)
 
     def load_index(self):
-        self.index = []
-        pos = self.index_pos
-        # print(f"Loading index from position: {self.index_pos}")  # Debug print
-        # print(f"Total file size: {len(self.mmap)}")  # Debug print
-        
-        while pos < len(self.mmap) - 8:  # -8 for final index position
-            try:
-                node_id, block_pos = struct.unpack('<QQ', self.mmap[pos:pos+16])
-                # print(f"Loaded index entry: node_id={node_id}, block_pos={block_pos}")  # Debug print
-                self.index.append((node_id, block_pos))
-                pos += 16
-            except Exception as e:
-                # print(f"Error reading index at position {pos}: {e}")
-                break
-        
-        # print(f"Loaded {len(self.index)} index entries")  # Debug print
-
+        # Zero-copy view of the index records straight from the mmap
+        count = (len(self.mmap) - 8 - self.index_pos) // WikiLinkWriter.INDEX_DTYPE.itemsize
+        self.index_arr = np.frombuffer(self.mmap, dtype=WikiLinkWriter.INDEX_DTYPE,
+                                       offset=self.index_pos, count=count)
+        self.index_ids = self.index_arr['id']
+        self.index_pos_arr = self.index_arr['pos']
+        self.index_slots = self.index_arr['slot']
+        self.index_degrees = self.index_arr['degree']
+        # Every SEARCH_WINDOW-th id, copied out so the coarse search step stays in cache
+        self._index_samples = self.index_ids[::self.SEARCH_WINDOW].copy()
+        self._last_hit = 0  # index row of the previous find_block match
 
     def load_title_map(self, map_path):
-        bidict = BiDict()
-        with open(map_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                try:
-                    node_id, title = line.strip().split('\t')
-                    bidict[int(node_id)] = title
-                except:
-                    print(line)
-        return bidict
+        """Load the id -> title map as a packed title blob with parallel offset/id arrays"""
+        with open(map_path, 'rb') as f:
+            raw = np.frombuffer(f.read(), dtype=np.uint8)
+
+        # Each line is "<node_id>\t<title>\n"
+        line_ends = np.flatnonzero(raw == ord('\n'))
+        if len(raw) and raw[-1] != ord('\n'):
+            line_ends = np.append(line_ends, len(raw))
+        line_starts = np.concatenate(([0], line_ends + 1))[:len(line_ends)]
+
+        # Only lines with exactly one tab are "<id>\t<title>" records
+        tabs = np.flatnonzero(raw == ord('\t'))
+        tab_lines = np.searchsorted(line_ends, tabs)
+        valid = np.bincount(tab_lines, minlength=len(line_ends)) == 1
+        tabs = tabs[valid[tab_lines]]
+
+        # Parse the decimal ids one digit column at a time, rejecting empty or non-numeric ones
+        id_starts = line_starts[valid]
+        widths = tabs - id_starts
+        ids = np.zeros(len(tabs), dtype=np.uint64)
+        numeric = widths > 0
+        for k in range(int(widths.max()) if len(widths) else 0):
+            has_digit = widths > k
+            digits = raw[id_starts[has_digit] + k] - np.uint8(ord('0'))
+            numeric[has_digit] &= digits <= 9
+            ids[has_digit] = ids[has_digit] * 10 + digits
+        valid[valid] = numeric
+
+        # Skip malformed lines, reporting them as the line-by-line loader did
+        for start, end in zip(line_starts[~valid].tolist(), line_ends[~valid].tolist()):
+            if end > start:
+                print(raw[start:end].tobytes().decode('utf-8', 'replace'))
+        ids, tabs, line_ends = ids[numeric], tabs[numeric], line_ends[valid]
+        title_starts = tabs + 1
+        title_ends = line_ends - ((line_ends > title_starts) & (raw[line_ends - 1] == ord('\r')))
+        del line_starts, line_ends, tabs, tab_lines, id_starts, widths, valid, numeric
+
+        # The writer emits ids in increasing order; only other maps need their rows sorted
+        if len(ids) > 1 and not (ids[1:] > ids[:-1]).all():
+            order = np.argsort(ids, kind='stable')
+            ids, title_starts, title_ends = ids[order], title_starts[order], title_ends[order]
+            data = raw.tobytes()
+            self._title_blob = b''.join(data[start:end] for start, end in zip(title_starts.tolist(), title_ends.tolist()))
+        else:
+            # Keep only the title bytes, dropping each "<id>\t" and line ending, with a
+            # one-byte-per-byte mask: +1 where a title starts, -1 where it ends, running sum
+            inside = np.zeros(len(raw) + 1, dtype=np.int8)
+            inside[title_starts] += 1
+            inside[title_ends] -= 1
+            np.cumsum(inside, dtype=np.int8, out=inside)
+            titles = raw[inside[:-1].view(np.bool_)]
+            del inside, raw  # release the file contents before copying the blob out
+            self._title_blob = titles.tobytes()
+
+        self._title_offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(title_ends - title_starts, out=self._title_offsets[1:])
+        self._id_to_row = ids
+        self._title_order = None  # rows sorted by title, built on first get_node_id
 
     def find_block(self, node_id):
-        """Binary search for the correct block"""
-        if not self.index:
+        """Interpolation search for the correct block, starting from the last hit"""
+        node_id = int(node_id)  # IDs from get_neighbors are uint32 and would wrap in the arithmetic below
+        ids = self.index_ids
+        n = len(ids)
+        if n == 0:
             raise ValueError("Index is empty - no blocks found")
-                
-        # print(f"Searching for node_id {node_id} in index")
-        # print(f"Index contains {len(self.index)} entries")
-        
-        # Binary search for exact match only
-        left = 0
-        right = len(self.index) - 1
         
-        while left <= right:
-            mid = (left + right) // 2
-            current_id = self.index[mid][0]
-            
-            if current_id == node_id:
-                return self.index[mid][1]
-            elif current_id < node_id:
-                left = mid + 1
-            else:
-                right = mid - 1
-                
-        return None  # No exact match found
+        # Traversals tend to ask for the same or the next node again
+        i = self._last_hit
+        if not (i < n and ids[i] == node_id):
+            i += 1
+        if not (i < n and ids[i] == node_id):
+            first, last = int(ids[0]), int(ids[-1])
+            if not first <= node_id <= last:
+                return None
+            # Node ids are close to dense, so interpolate a guess and only search a
+            # narrow window around it
+            guess = (node_id - first) * (n - 1) // (last - first) if last > first else 0
+            left = max(guess - self.SEARCH_WINDOW, 0)
+            right = min(guess + self.SEARCH_WINDOW + 1, n)
+            key = np.uint32(node_id)  # a Python int would make NumPy cast the whole view
+            if not ids[left] <= node_id <= ids[right-1]:
+                # On a miss, the cached samples pick the one window of the mmapped index to search
+                left = (int(self._index_samples.searchsorted(key, 'right')) - 1) * self.SEARCH_WINDOW
+                right = min(left + self.SEARCH_WINDOW, n)
+            i = left + int(ids[left:right].searchsorted(key))
+            if not (i < right and ids[i] == node_id):
+                return None  # No exact match found
+
+        self._last_hit = i
+        return int(self.index_pos_arr[i]), int(self.index_slots[i]), int(self.index_degrees[i])
+
+    def read_superblock(self, pos):
+        """Decompress the super-block at pos, returning its payload and node offsets"""
+        superblock = self._superblocks.get(pos)
+        if superblock is not None:
+            self._superblocks.move_to_end(pos)
+            return superblock
+
+        # Read framing and the frame itself in place, without copying them out of the mmap
+        size, count = struct.unpack_from('<IH', self.mmap, pos)
+        offsets = struct.unpack_from(f'<{count+1}I', self.mmap, pos+6)
+        payload_pos = pos + 10 + 4 * count
+        superblock = self.dctx.decompress(memoryview(self.mmap)[payload_pos:payload_pos+size]), offsets
+
+        # Hub-heavy super-blocks can be large, so bound the cache by bytes rather than entries
+        self._superblocks[pos] = superblock
+        self._superblock_bytes += len(superblock[0])
+        while self._superblock_bytes > self.CACHE_BYTES and len(self._superblocks) > 1:
+            payload, _ = self._superblocks.popitem(last=False)[1]
+            self._superblock_bytes -= len(payload)
+        return superblock
 
     @profile
     def get_neighbors(self, node_id):
-        """Get all neighbors for a node"""
-        block_pos = self.find_block(node_id)
+        """Get all neighbors for a node, as a uint32 array"""
+        block = self.find_block(node_id)
         
-        if block_pos is None:
-            # print(f"No edges found for node {node_id}")
-            return []
+        if block is None:
+            return np.empty(0, dtype=np.uint32)
             
-        # print(f"Looking for node {node_id}, found block at position {block_pos}")
+        block_pos, slot, degree = block
         
-        # Read block size
-        block_size = struct.unpack('<I', self.mmap[block_pos:block_pos+4])[0]
-        # print(f"Block size: {block_size}")
-
-        # Read and decompress block
-        compressed = self.mmap[block_pos+4:block_pos+4+block_size]
-        data = zlib.decompress(compressed)
+        if degree <= WikiLinkWriter.TINY_DEGREE:
+            return self.decode_tiny(block_pos, degree)
+        if self.compressed:
+            # Slice this node's edges out of the (cached) decompressed super-block
+            payload, offsets = self.read_superblock(block_pos)
+            data = memoryview(payload)[offsets[slot]:offsets[slot+1]]
+        else:
+            # Raw blocks are read in place from the mmap
+            block_size = struct.unpack_from('<I', self.mmap, block_pos)[0]
+            data = memoryview(self.mmap)[block_pos+4:block_pos+4+block_size]
         
-        # First byte should be the number of edges
-        num_edges = varint.decode_bytes(data)
-        # print(f"Number of edges: {num_edges}")
+        # Block starts with the number of edges
+        num_edges, pos = read_varint(data)
         
         # If this is an empty block, return empty list
         if num_edges == 0:
-            return []
+            return np.empty(0, dtype=np.uint32)
             
-        # If we have edges, decode them
+        # Decode all deltas in one go, then prefix-sum them into node ids
+        return decode_streamvbyte(data, num_edges, pos).cumsum(dtype=np.uint32)
+
+    def decode_tiny(self, block_pos, degree):
+        """Decode a raw block of at most TINY_DEGREE edges with plain integer ops"""
+        # Skip the block size and the one-byte edge count; one control byte covers every edge
+        control = self.mmap[block_pos+5]
+        pos = block_pos + 6
         edges = []
-        pos = len(varint.encode(num_edges))  # Skip past the edge count
-        prev = 0
-        
-        for _ in range(num_edges):
-            delta = varint.decode_bytes(data[pos:])
-            pos += len(varint.encode(delta))
-            prev += delta
-            edges.append(prev)
-        
-        return edges
+        node_id = 0
+        for shift in range(0, 2 * degree, 2):
+            length = (control >> shift & 3) + 1
+            node_id += int.from_bytes(self.mmap[pos:pos+length], 'little')
+            pos += length
+            edges.append(node_id)
+        return np.array(edges, dtype=np.uint32)
 
     def get_title(self, node_id):
         """Get the title for a given node ID"""
-        return self.title_map.get(node_id, None)
+        if node_id < 0:
+            return None
+        # Search with a matching scalar type; a Python int makes NumPy cast the whole array
+        row = self._id_to_row.searchsorted(np.uint64(node_id))
+        if row == len(self._id_to_row) or self._id_to_row[row] != node_id:
+            return None
+        return self._title_blob[self._title_offsets[row]:self._title_offsets[row+1]].decode('utf-8')
+
+    def get_node_id(self, title):
+        """Get the node ID for a given title"""
+        blob, offsets = self._title_blob, self._title_offsets
+        if self._title_order is None:
+            # A packed permutation of rows in title order, searched against the blob directly
+            self._title_order = np.array(sorted(range(len(self._id_to_row)),
+                                                key=lambda row: blob[offsets[row]:offsets[row+1]]),
+                                         dtype=np.uint32)
+        # Memoryviews index to plain ints, much faster than NumPy scalars in this loop
+        order, offsets = memoryview(self._title_order), memoryview(offsets)
+        key = title.encode('utf-8')
+        left, right = 0, len(order)
+        while left < right:
+            mid = (left + right) // 2
+            row = order[mid]
+            if blob[offsets[row]:offsets[row+1]] < key:
+                left = mid + 1
+            else:
+                right = mid
+        if left < len(order):
+            row = order[left]
+            if blob[offsets[row]:offsets[row+1]] == key:
+                return int(self._id_to_row[row])
+        return None
 
     def close(self):
+        # Release the index views before unmapping the buffer they export
+        self.index_arr = self.index_ids = self.index_pos_arr = self.index_slots = self.index_degrees = None
+        self._superblocks.clear()
+        self._superblock_bytes = 0
         self.file.close()
         self.mmap.close()
 
 # Usage example:
-def convert_wiki_jsonl(jsonl_path, output_path, map_path):
-    writer = WikiLinkWriter(output_path, map_path)
-    with open(jsonl_path, 'r', encoding='utf-8') as f:
+def convert_wiki_jsonl(jsonl_path, output_path, map_path, compress=True, workers=1):
+    writer = WikiLinkWriter(output_path, map_path, compress, workers)
+    with open(jsonl_path, 'rb') as f:
         writer.process_jsonl_dump(f)
     writer.close()
 
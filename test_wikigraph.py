@@ -0,0 +1,227 @@
+import json
+import struct
+
+import numpy as np
+import pytest
+import zstandard as zstd
+
+from WikiGraph import WikiLinkReader, WikiLinkWriter, convert_wiki_jsonl, decode_streamvbyte, encode_edge_lists, read_varint
+
+
+def build_graph(tmp_path, lines, **kwargs):
+    """Convert JSONL lines (dicts of title -> linked titles) and open a reader on the result"""
+    jsonl_path = tmp_path / 'links.json'
+    jsonl_path.write_text(''.join(json.dumps(line) + '\n' for line in lines), encoding='utf-8')
+    convert_wiki_jsonl(jsonl_path, tmp_path / 'graph.bin', tmp_path / 'map.bin', workers=1, **kwargs)
+    return WikiLinkReader(tmp_path / 'graph.bin', tmp_path / 'map.bin')
+
+
+def test_traversal_with_returned_ids(tmp_path):
+    # A chain long enough that the index interpolation has a window to search
+    titles = [f"Page_{i}" for i in range(500)]
+    lines = [{title: [titles[(i + 1) % len(titles)], titles[(i + 7) % len(titles)]]}
+             for i, title in enumerate(titles)]
+    reader = build_graph(tmp_path, lines)
+
+    # Feed the returned uint32 IDs straight back in, breadth first
+    start = reader.get_node_id("Page_0")
+    seen, frontier = {start}, [start]
+    while frontier:
+        node_id = frontier.pop(0)
+        for neighbor in reader.get_neighbors(node_id):
+            assert reader.get_title(neighbor) is not None
+            if int(neighbor) not in seen:
+                seen.add(int(neighbor))
+                frontier.append(neighbor)
+    assert len(seen) == len(titles)
+    reader.close()
+
+
+def round_trip(edges):
+    """Encode one edge list and decode its deltas back, as the reader does"""
+    encoded, offsets = encode_edge_lists([len(edges)], edges)
+    assert offsets.tolist() == [0, len(encoded)]
+    count, pos = read_varint(encoded)
+    assert count == len(edges)
+    return decode_streamvbyte(encoded, count, pos)
+
+
+@pytest.mark.parametrize('count', range(10))
+def test_streamvbyte_round_trip_lengths(count):
+    # Covers every fill level of the last control byte
+    edges = np.arange(count, dtype=np.int64) * 997
+    if count == 0:
+        assert decode_streamvbyte(b'', 0).tolist() == []
+    else:
+        assert round_trip(edges[::-1]).cumsum().tolist() == edges.tolist()
+
+
+def test_streamvbyte_round_trip_byte_boundaries():
+    deltas = [0, 1, 255, 256, 65535, 65536, 2**24 - 1, 2**24, 2**32 - 1]
+    edges = np.cumsum(deltas)
+    assert round_trip(edges).tolist() == deltas
+    encoded, _ = encode_edge_lists([len(edges)], edges)
+    assert len(encoded) == 1 + 3 + 1 + 1 + 1 + 2 + 2 + 3 + 3 + 4 + 4
+
+
+def test_edge_lists_encode_like_single_lists():
+    # Random list lengths with deltas straddling every byte-length boundary
+    rng = np.random.default_rng(1)
+    boundaries = np.array([0, 1, 255, 256, 65535, 65536, 2**24 - 1, 2**24, 2**32 - 1])
+    degrees = rng.integers(1, 20, size=200)
+    lists = [np.cumsum(rng.choice(boundaries, size=degree)) for degree in degrees]
+    encoded, offsets = encode_edge_lists(degrees, np.concatenate(lists))
+    for edges, start, end in zip(lists, offsets, offsets[1:]):
+        assert encoded[start:end] == encode_edge_lists([len(edges)], edges)[0]
+        assert round_trip(rng.permutation(edges)).cumsum().tolist() == edges.tolist()
+
+
+@pytest.mark.parametrize('compress', [True, False])
+def test_neighbors_match_reference(tmp_path, compress):
+    rng = np.random.default_rng(0)
+    titles = [f"Page_{i}" for i in range(300)]
+    lines = []
+    for i, title in enumerate(titles):
+        # Mix tiny lists, empty lists and lists large enough for several control bytes
+        degree = [0, 1, 3, 4, 5, 40][i % 6]
+        lines.append({title: [titles[j] for j in rng.integers(len(titles), size=degree)]})
+    # Duplicate listings: the last one wins
+    lines.append({"Page_7": ["Page_1", "Page_2", "Page_299"]})
+    lines.append({"Page_11": [titles[j] for j in range(0, 300, 3)]})
+    # Linked only, never listed itself
+    lines.append({"Page_12": ["Orphan"]})
+    reader = build_graph(tmp_path, lines, compress=compress)
+
+    reference = {}
+    for line in lines:
+        for title, linked_titles in line.items():
+            reference[title] = linked_titles
+    reference["Orphan"] = []
+
+    for title, linked_titles in reference.items():
+        node_id = reader.get_node_id(title)
+        assert reader.get_title(node_id) == title
+        neighbors = reader.get_neighbors(node_id)
+        assert neighbors.dtype == np.uint32
+        assert [reader.get_title(n) for n in neighbors] == sorted(linked_titles, key=reader.get_node_id)
+    reader.close()
+
+
+@pytest.mark.parametrize('compress', [True, False])
+def test_workers_match_in_process_build(tmp_path, monkeypatch, compress):
+    # Small batches so the dump spans many worker calls and the in-flight queue fills up
+    monkeypatch.setattr(WikiLinkWriter, 'BATCH_BYTES', 2000)
+    rng = np.random.default_rng(2)
+    titles = [f"Page_{i}" for i in range(400)]
+    lines = [{title: [titles[j] for j in rng.integers(len(titles), size=rng.integers(0, 30))]}
+             for title in titles]
+    lines += lines[:50]  # listed again in a later batch
+    jsonl_path = tmp_path / 'links.json'
+    jsonl_path.write_text(''.join(json.dumps(line) + '\n' for line in lines), encoding='utf-8')
+
+    outputs = []
+    for workers in (1, 3):
+        graph_path, map_path = tmp_path / f'graph{workers}.bin', tmp_path / f'map{workers}.bin'
+        convert_wiki_jsonl(jsonl_path, graph_path, map_path, compress=compress, workers=workers)
+        outputs.append((graph_path.read_bytes(), map_path.read_bytes()))
+    assert outputs[0] == outputs[1]
+
+
+def test_many_superblocks_and_cache_eviction(tmp_path, monkeypatch):
+    # Small limits so both flush thresholds trigger and the cache has to evict
+    monkeypatch.setattr(WikiLinkWriter, 'SUPERBLOCK_NODES', 8)
+    monkeypatch.setattr(WikiLinkWriter, 'SUPERBLOCK_SIZE', 400)
+    monkeypatch.setattr(WikiLinkReader, 'CACHE_BYTES', 1000)
+    rng = np.random.default_rng(3)
+    titles = [f"Page_{i}" for i in range(300)]
+    # Mostly non-tiny lists, with the odd hub that fills a frame on its own
+    reference = {title: [titles[j] for j in rng.integers(len(titles), size=200 if i % 50 == 0 else 10)]
+                 for i, title in enumerate(titles)}
+    reader = build_graph(tmp_path, [{title: linked} for title, linked in reference.items()])
+
+    compressed = reader.index_degrees > WikiLinkWriter.TINY_DEGREE
+    frames, members = np.unique(reader.index_pos_arr[compressed], return_counts=True)
+    assert len(frames) > len(titles) // 8
+    assert members.max() == 8 and members.min() < 8
+    for _ in range(2):
+        for title, linked_titles in reference.items():
+            neighbors = reader.get_neighbors(reader.get_node_id(title))
+            assert [reader.get_title(n) for n in neighbors] == sorted(linked_titles, key=reader.get_node_id)
+            assert reader._superblock_bytes <= WikiLinkReader.CACHE_BYTES or len(reader._superblocks) == 1
+    reader.close()
+    assert not reader._superblocks
+
+
+def test_title_map_skips_malformed_lines(tmp_path, capsys):
+    reader = build_graph(tmp_path, [{"A": ["B", "Été"]}, {"B": ["A"]}])
+    reader.close()
+    map_path = tmp_path / 'map.bin'
+    with open(map_path, 'ab') as f:
+        f.write(b"7\tTab\tin title\nx\tNot an id\n\n\tNo id\n8\tKept\n")
+    reader = WikiLinkReader(tmp_path / 'graph.bin', map_path)
+
+    assert capsys.readouterr().out.splitlines() == ["7\tTab\tin title", "x\tNot an id", "\tNo id"]
+    assert [reader.get_title(node_id) for node_id in range(4)] == ["A", "B", "Été", None]
+    assert reader.get_title(8) == "Kept"
+    assert [reader.get_node_id(title) for title in ["Été", "Kept", "B", "Tab", "Missing"]] == [2, 8, 1, None, None]
+    reader.close()
+
+
+def test_find_block_on_skewed_ids(tmp_path):
+    # Densely numbered pages first, then pages that each introduce many unlisted leaves,
+    # so interpolating over the id range lands far from the right index window
+    dense = [f"Dense_{i}" for i in range(200)]
+    reference = {title: [dense[(i + 1) % len(dense)]] * 5 for i, title in enumerate(dense)}
+    for i in range(100):
+        reference[f"Sparse_{i}"] = [f"Leaf_{i}_{j}" for j in range(50)]
+    reader = build_graph(tmp_path, [{title: linked} for title, linked in reference.items()])
+
+    for title, linked_titles in reference.items():
+        neighbors = reader.get_neighbors(reader.get_node_id(title))
+        assert [reader.get_title(n) for n in neighbors] == sorted(linked_titles, key=reader.get_node_id)
+    indexed = set(reader.index_ids.tolist())
+    for node_id in range(int(reader.index_ids[-1]) + 2):
+        assert (reader.find_block(node_id) is None) == (node_id not in indexed)
+    reader.close()
+
+
+def test_verify_encoding(tmp_path):
+    writer = WikiLinkWriter(tmp_path / 'graph.bin', tmp_path / 'map.bin')
+    encoded = writer.encode_edges([70000, 3, 2**32 - 1, 3])
+    assert writer.verify_encoding([3, 3, 2**32 - 1, 70000], encoded)
+    assert not writer.verify_encoding([3, 4, 2**32 - 1, 70000], encoded)
+    assert not writer.verify_encoding([3, 3, 2**32, 70000], encoded)  # not representable as uint32
+    assert not writer.verify_encoding([3, 3, 2**32 - 1, 70000], encoded[:-1])
+    assert writer.verify_encoding([], writer.encode_edges([]))
+    writer.close()
+
+
+def test_rejects_other_format_versions(tmp_path):
+    build_graph(tmp_path, [{"A": ["B"]}]).close()
+    graph_path = tmp_path / 'graph.bin'
+    data = bytearray(graph_path.read_bytes())
+    struct.pack_into('<I', data, 8, WikiLinkWriter.VERSION - 1)
+    graph_path.write_bytes(data)
+    with pytest.raises(ValueError, match="version"):
+        WikiLinkReader(graph_path, tmp_path / 'map.bin')
+
+
+def test_stored_dictionary_round_trip(tmp_path):
+    rng = np.random.default_rng(4)
+    titles = [f"Page_{i}" for i in range(2000)]
+    reference = {title: [titles[j] for j in rng.integers(len(titles), size=20)] for title in titles}
+    reader = build_graph(tmp_path, [{title: linked} for title, linked in reference.items()])
+
+    # The trained dictionary sits right after the header, and frames need it to decompress
+    dict_size, = struct.unpack_from('<I', reader.mmap, 20)
+    assert 0 < dict_size <= WikiLinkWriter.DICT_SIZE
+    superblock_pos = int(reader.index_pos_arr[0])
+    size, count = struct.unpack_from('<IH', reader.mmap, superblock_pos)
+    frame_pos = superblock_pos + 10 + 4 * count
+    with pytest.raises(zstd.ZstdError):
+        zstd.ZstdDecompressor().decompress(reader.mmap[frame_pos:frame_pos+size])
+
+    for title, linked_titles in reference.items():
+        neighbors = reader.get_neighbors(reader.get_node_id(title))
+        assert [reader.get_title(n) for n in neighbors] == sorted(linked_titles, key=reader.get_node_id)
+    reader.close()